@@ -83,15 +83,18 @@ class BaseTDEM(QWidget):
         self.z_artists = []
         self.data = pd.DataFrame()
 
+        # Coalesce bursts of spinbox changes (held arrow keys, mouse wheel) into a single re-plot
+        self._replot_timer = QtCore.QTimer(self)
+        self._replot_timer.setSingleShot(True)
+        self._replot_timer.setInterval(50)
+
         # Signals
+        self._replot_timer.timeout.connect(self._do_replot)
         self.plot_cbox.toggled.connect(self.toggle)
         self.legend_name.editingFinished.connect(self.plot)
-        self.scale_data_sbox.valueChanged.connect(self.plot)
-        self.scale_data_sbox.valueChanged.connect(lambda: self.plot_changed_sig.emit())
-        self.shift_stations_sbox.valueChanged.connect(self.plot)
-        self.shift_stations_sbox.valueChanged.connect(lambda: self.plot_changed_sig.emit())
-        self.alpha_sbox.valueChanged.connect(self.plot)
-        self.alpha_sbox.valueChanged.connect(lambda: self.plot_changed_sig.emit())
+        self.scale_data_sbox.valueChanged.connect(self._replot_timer.start)
+        self.shift_stations_sbox.valueChanged.connect(self._replot_timer.start)
+        self.alpha_sbox.valueChanged.connect(self._replot_timer.start)
         self.min_ch.valueChanged.connect(lambda: self.update_channels("min"))
         self.max_ch.valueChanged.connect(lambda: self.update_channels("max"))
 
@@ -101,17 +104,30 @@ class BaseTDEM(QWidget):
         """
         pass
 
+    def _do_replot(self):
+        """Re-plot once the spinbox values have settled. plot() emits plot_changed_sig itself."""
+        self.plot()
+
+    def get_plotting_data(self, data, station_column, channels):
+        """
+        Select the plotted channel window and apply the station shift and data scale in one pass.
+        :param data: DataFrame of the readings to plot.
+        :param station_column: str, name of the station column.
+        :param channels: list of str, channel columns to plot.
+        :return: tuple, 1D array of stations and 2D array of the data with one column per channel.
+        """
+        x = data.loc[:, station_column].to_numpy(dtype=float) + self.shift_stations_sbox.value()
+        y = data.loc[:, channels].to_numpy(dtype=float) * self.scale_data_sbox.value()
+        return x, y
+
     def clear(self):
-        # Remove existing plotted lines
-        for ls, ax in zip([self.x_artists, self.y_artists, self.z_artists], self.axes.values()):
-            if ax.lines:
-                if all([artist in ax.lines for artist in ls]):
-                    for artist in ls:
-                        ax.lines.remove(artist)
-            if ax.collections:
-                if all([artist in ax.collections for artist in ls]):
-                    for artist in ls:
-                        ax.collections.remove(artist)
+        # A re-plot still pending from the spinboxes would plot the lines again after they are cleared
+        self._replot_timer.stop()
+
+        # Remove existing plotted lines. Artists hidden by toggle are already detached from their axes.
+        for artist in self.x_artists + self.y_artists + self.z_artists:
+            if artist.axes is not None:
+                artist.remove()
 
         self.x_artists = []
         self.y_artists = []
@@ -119,39 +135,18 @@ class BaseTDEM(QWidget):
 
     def toggle(self):
         """Toggle the visibility of plotted lines/points"""
-        for ax in self.axes.values():
-            if ax == self.axes['X']:
-                artists = self.x_artists
-            elif ax == self.axes['Y']:
-                artists = self.y_artists
-            else:
-                artists = self.z_artists
-
-            lines = list(filter(lambda x: isinstance(x, matplotlib.lines.Line2D), artists))
-            points = list(filter(lambda x: isinstance(x, matplotlib.collections.PathCollection), artists))  # Scatters
-
-            if lines:
-                if self.plot_cbox.isChecked():
-                    if all([a in ax.lines for a in lines]):  # If the lines are already plotted, pass.
-                        pass
-                    else:
-                        for artist in artists:
-                            ax.lines.append(artist)
-                else:
-                    for artist in artists:
-                        ax.lines.remove(artist)
-
-            if points:
-                # Add or remove the scatter points
-                if self.plot_cbox.isChecked():
-                    if all([a in ax.collections for a in points]):  # If the points are already plotted, pass.
-                        pass
+        checked = self.plot_cbox.isChecked()
+        for ax, artists in zip(self.axes.values(), [self.x_artists, self.y_artists, self.z_artists]):
+            for artist in artists:
+                if not checked:
+                    if artist.axes is not None:
+                        artist.remove()
+                elif artist.axes is None:
+                    # Re-attach the artist, skipping the ones that are already plotted
+                    if isinstance(artist, matplotlib.collections.PathCollection):  # Scatters
+                        ax.add_collection(artist)
                     else:
-                        for artist in artists:
-                            ax.collections.append(artist)
-                else:
-                    for artist in artists:
-                        ax.collections.remove(artist)
+                        ax.add_line(artist)
 
         self.plot_changed_sig.emit()
 
@@ -174,13 +169,9 @@ class BaseTDEM(QWidget):
             if max_ch < min_ch:
                 self.min_ch.setValue(max_ch)
 
-        self.plot()
+        # Re-plot once the channel range settles. The plotter re-scales the axes from plot_changed_sig.
+        self._replot_timer.start()
 
         self.min_ch.blockSignals(False)
         self.max_ch.blockSignals(False)
 
-        for ax in self.axes.values():
-            # Re-scale the plots
-            ax.relim()
-            ax.autoscale()
-
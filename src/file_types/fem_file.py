@@ -1,4 +1,7 @@
+import copy
 import re
+from collections import OrderedDict
+from io import StringIO
 from pathlib import Path
 
 import matplotlib
@@ -8,6 +11,16 @@ from PyQt5 import QtCore
 from PyQt5.QtWidgets import (QLabel, QFormLayout, QWidget, QCheckBox, QDoubleSpinBox, QSizePolicy, QSpinBox)
 from natsort import natsorted
 
+from src.file_types.maxwell_header import format_loop_coords, parse_loop_coords, parse_units
+
+# KEY:VALUE header tokens, split on the first colon only so values containing colons are kept whole
+_HEADER_RE = re.compile(r'([^\s:]+):(\S*)')
+
+# The last few parsed files keyed by (resolved path, modified time, size), least recently used first. Entries outlive
+# their tab, so closing and re-opening a file doesn't parse it again.
+_FEM_CACHE = OrderedDict()
+_FEM_CACHE_SIZE = 8
+
 
 class FEMTab(QWidget):
     plot_changed_sig = QtCore.pyqtSignal()
@@ -74,9 +87,8 @@ class FEMTab(QWidget):
         ext = filepath.suffix.lower()
 
         if ext == '.fem':
-            parser = FEMFile()
             try:
-                file = parser.parse(filepath)
+                file = parse_cached(filepath)
             except Exception as e:
                 raise Exception(f"The following error occurred trying to parse the file: {e}.")
         else:
@@ -115,8 +127,8 @@ class FEMTab(QWidget):
         if file.components:
             self.layout.addRow('Components', QLabel('\n'.join(natsorted(np.unique(file.components)))))
 
-        if not file.loop_coords.empty:
-            self.layout.addRow('Loop Coordinates', QLabel(file.loop_coords.to_string()))
+        if file.loop_coords.size:
+            self.layout.addRow('Loop Coordinates', QLabel(format_loop_coords(file.loop_coords)))
 
         self.data = file.data
         self.file = file
@@ -132,37 +144,43 @@ class FEMTab(QWidget):
         self.vca_artists = []
         size = 10
 
+        # Read the widget values once, rather than for every artist
+        alpha = self.alpha_sbox.value() / 100
+        color = self.color
+        stations = self.file.stations
+        amplitudes = self.file.amplitudes
+
         # When there's component-by-frequency
         if self.file.comp_by_freq:
 
-            for freq, component in self.file.comp_by_freq.items():
-                print(f"Plotting frequency {freq}")
-                comp_data = self.data.loc[:, ['STATION', freq]]
+            shift = self.shift_stations_sbox.value()
+            scale = self.scale_data_sbox.value()
 
-                if comp_data.empty:
+            for i, (freq, component) in enumerate(self.file.comp_by_freq.items()):
+                if stations.size == 0:
                     print(f"No data for component {component} and frequency {freq}.")
                     continue
 
                 ax = self.axes[component]
-                x = comp_data.STATION.astype(float) + self.shift_stations_sbox.value()
-                y = comp_data.loc[:, freq].astype(float) * self.scale_data_sbox.value()
+                x = stations + shift
+                y = amplitudes[:, i] * scale
 
                 if len(x) == 1:
-                    style = 'x' if 'Q' in freq else 'o'
+                    style = self.file.freq_markers[freq]
                     artist = ax.scatter(x, y,
-                                        color=self.color,
+                                        color=color,
                                         marker=style,
                                         s=size,
-                                        alpha=self.alpha_sbox.value() / 100,
-                                        label=f"{freq} - {self.file.filepath.stem} (Maxwell)")
+                                        alpha=alpha,
+                                        label=self.file.freq_labels[freq])
 
                 else:
-                    style = '--' if 'Q' in freq else '-'
+                    style = self.file.freq_styles[freq]
                     artist, = ax.plot(x, y,
                                       ls=style,
-                                      color=self.color,
-                                      alpha=self.alpha_sbox.value() / 100,
-                                      label=f"{freq} - {self.file.filepath.stem} (Maxwell)")
+                                      color=color,
+                                      alpha=alpha,
+                                      label=self.file.freq_labels[freq])
 
                 if component == 'HCP':
                     self.hcp_artists.append(artist)
@@ -172,38 +190,39 @@ class FEMTab(QWidget):
                 size += 10  # For scatter point size
 
         else:
-            for freq in self.file.frequencies:
-                print(f"Plotting {freq} frequency.")
+            # Find the rows of each component once, rather than for every frequency
+            component_values = self.file.component_values
+            masks = {component: component_values == component for component in self.file.components}
 
+            for i, freq in enumerate(self.file.frequencies):
                 for component in self.file.components:
-                    print(f"Plotting component {component}.")
                     ax = self.axes[component]
 
-                    comp_data = self.data[self.data.COMPONENT == component]
+                    mask = masks[component]
 
-                    if comp_data.empty:
+                    if not mask.any():
                         print(f"No data for component {component} and frequency {freq}.")
                         continue
 
-                    x = comp_data.STATION.astype(float)
-                    y = comp_data.loc[:, freq].astype(float)
+                    x = stations[mask]
+                    y = amplitudes[mask, i]
 
                     if len(x) == 1:
-                        style = 'x' if 'Q' in freq else 'o'
+                        style = self.file.freq_markers[freq]
                         artist = ax.scatter(x, y,
-                                            color=self.color,
+                                            color=color,
                                             marker=style,
                                             s=size,
-                                            alpha=self.alpha_sbox.value() / 100,
-                                            label=f"{freq} ({self.file.filepath.name})")
+                                            alpha=alpha,
+                                            label=self.file.freq_labels[freq])
 
                     else:
-                        style = '--' if 'Q' in freq else '-'
+                        style = self.file.freq_styles[freq]
                         artist, = ax.plot(x, y,
                                           ls=style,
-                                          color=self.color,
-                                          alpha=self.alpha_sbox.value() / 100,
-                                          label=f"{freq} ({self.file.filepath.name})")
+                                          color=color,
+                                          alpha=alpha,
+                                          label=self.file.freq_labels[freq])
 
                     if component == 'HCP':
                         self.hcp_artists.append(artist)
@@ -213,54 +232,60 @@ class FEMTab(QWidget):
                     size += 10  # For scatter point size
 
     def clear(self):
-        # Remove existing plotted lines
-        for ls, ax in zip([self.hcp_artists, self.vca_artists], self.axes.values()):
-            if ax.lines:
-                if all([artist in ax.lines for artist in ls]):
-                    for artist in ls:
-                        ax.lines.remove(artist)
-            if ax.collections:
-                if all([artist in ax.collections for artist in ls]):
-                    for artist in ls:
-                        ax.collections.remove(artist)
+        # Remove existing plotted lines. Artists hidden by toggle are already detached from their axes.
+        for artist in self.hcp_artists + self.vca_artists:
+            if artist.axes is not None:
+                artist.remove()
 
     def toggle(self):
         """Toggle the visibility of plotted lines/points"""
-        for ax in self.axes.values():
-            if ax == self.axes['HCP']:
-                artists = self.hcp_artists
-            else:
-                artists = self.vca_artists
-
-            lines = list(filter(lambda x: isinstance(x, matplotlib.lines.Line2D), artists))
-            points = list(filter(lambda x: isinstance(x, matplotlib.collections.PathCollection), artists))  # Scatters
-
-            if lines:
-                if self.plot_cbox.isChecked():
-                    if all([a in ax.lines for a in lines]):  # If the lines are already plotted, pass.
-                        pass
-                    else:
-                        for artist in artists:
-                            ax.lines.append(artist)
-                else:
-                    for artist in artists:
-                        ax.lines.remove(artist)
-
-            if points:
-                # Add or remove the scatter points
-                if self.plot_cbox.isChecked():
-                    if all([a in ax.collections for a in points]):  # If the points are already plotted, pass.
-                        pass
+        checked = self.plot_cbox.isChecked()
+        for ax, artists in zip(self.axes.values(), [self.hcp_artists, self.vca_artists]):
+            for artist in artists:
+                if not checked:
+                    if artist.axes is not None:
+                        artist.remove()
+                elif artist.axes is None:
+                    # Re-attach the artist, skipping the ones that are already plotted
+                    if isinstance(artist, matplotlib.collections.PathCollection):  # Scatters
+                        ax.add_collection(artist)
                     else:
-                        for artist in artists:
-                            ax.collections.append(artist)
-                else:
-                    for artist in artists:
-                        ax.collections.remove(artist)
+                        ax.add_line(artist)
 
         self.plot_changed_sig.emit()
 
 
+def parse_cached(filepath):
+    """
+    Parse a FEM file, re-using the previous result if the file hasn't changed on disk since it was last parsed.
+    :param filepath: Path object
+    :return: FEMFile object. A copy of the cached file with its own data.
+    """
+    stat = filepath.stat()
+    path = str(filepath.resolve())
+    key = (path, stat.st_mtime_ns, stat.st_size)
+
+    if key in _FEM_CACHE:
+        _FEM_CACHE.move_to_end(key)
+    else:
+        file = FEMFile().parse(filepath)
+
+        # Drop older versions of the same file
+        for old_key in [k for k in _FEM_CACHE if k[0] == path]:
+            del _FEM_CACHE[old_key]
+
+        _FEM_CACHE[key] = file
+        if len(_FEM_CACHE) > _FEM_CACHE_SIZE:
+            _FEM_CACHE.popitem(last=False)
+
+    file = copy.copy(_FEM_CACHE[key])
+    # The cached file may have been parsed through a different path to the same file
+    file.filepath = filepath
+    file._set_freq_labels()
+    file.data = file.data.copy()
+    return file
+
+
 class FEMFile:
     """
     Maxwell FEM file object
@@ -288,9 +313,16 @@ class FEMFile:
         self.tx_dipole = False
 
         self.frequencies = []
+        self.freq_markers = {}
+        self.freq_styles = {}
+        self.freq_labels = {}
         self.comp_by_freq = {}
-        self.loop_coords = pd.DataFrame()
+        self.loop_coords = np.empty((0, 3))  # Easting, Northing, Elevation of each loop vertex
         self.data = pd.DataFrame()
+        # Contiguous copies of the data, with one amplitude column per frequency
+        self.stations = np.empty(0)
+        self.amplitudes = np.empty((0, 0), dtype=np.float32)
+        self.component_values = np.empty(0, dtype=object)  # Component of each row, when the file has a single one
 
     def parse(self, filepath):
         self.filepath = Path(filepath)
@@ -299,53 +331,72 @@ class FEMFile:
             raise ValueError(f"{self.filepath} is not a file.")
 
         print(f"Parsing {self.filepath.name}")
-        with open(filepath, 'r') as file:
-            content = file.read()
-            split_content = re.sub(' &', '', content).split('\n')
+        content = self.filepath.read_text()
+
+        # Only the header carries ' &' line continuations, so the data block is left untouched
+        profile_pos = content.find('/PROFILEX:')
+        if profile_pos == -1:
+            raise ValueError(f"No /PROFILEX: data block found in {self.filepath.name}.")
+        top_section = content[:profile_pos]
+        split_content = top_section.replace(' &', '').splitlines()
+
+        self._parse_header(split_content)
+
+        if not self.tx_dipole:
+            self.loop_coords = parse_loop_coords(split_content)
+
+        # Slice out only the /FREQ= line rather than splitting the header around it
+        freq_pos = top_section.find('/FREQ=')
+        assert freq_pos != -1, f"No frequencies found."
+        freq_pos += len('/FREQ=')
+        frequencies = top_section[freq_pos:top_section.find('\n', freq_pos)].split(',')
+        self.frequencies = frequencies
+        # Quadrature frequencies are drawn with crosses/dashes, in-phase ones with dots/solid lines
+        self.freq_markers = {freq: 'x' if 'Q' in freq else 'o' for freq in frequencies}
+        self.freq_styles = {freq: '--' if 'Q' in freq else '-' for freq in frequencies}
+
+        data = self._parse_data(top_section, content[content.find('\n', profile_pos) + 1:], frequencies)
+        self._parse_components(top_section, data)
 
-        # The top two lines of headers
-        header = split_content[1].split()
+        self._set_freq_labels()
+
+        self.data = data
+        self.stations = data.STATION.to_numpy(dtype=float)
+        self.amplitudes = data.loc[:, frequencies].to_numpy(dtype=np.float32)
+        if 'COMPONENT' in data.columns:
+            self.component_values = data.COMPONENT.to_numpy(dtype=object)
+
+        return self
+
+    def _set_freq_labels(self):
+        """
+        Set the legend label of each frequency. They only depend on the file, so they're made once rather than on
+        every plot.
+        """
+        if self.comp_by_freq:
+            self.freq_labels = {freq: f"{freq} - {self.filepath.stem} (Maxwell)" for freq in self.frequencies}
+        else:
+            self.freq_labels = {freq: f"{freq} ({self.filepath.name})" for freq in self.frequencies}
+
+    def _parse_header(self, split_content):
+        """
+        Set the survey attributes from the two header lines.
+        :param split_content: list of str, lines of the header with the line continuations removed.
+        """
+        header = split_content[1]
         # Ignore loop name because the spaces in the name causes problems with files that are dipole tx
         if 'loop' not in split_content[2].lower():
-            header.extend(split_content[2].split())
+            header += ' ' + split_content[2]
 
-        header_dict = {}
-        for match in header:
-            value = match.split(':')
-            header_dict[value[0]] = value[1]
+        header_dict = dict(_HEADER_RE.findall(header))
 
         self.rx_dipole = True if header_dict['RXDIPOLE'] == 'YES' else False
         self.tx_dipole = True if header_dict['TXDIPOLE'] == 'YES' else False
 
-        if not self.tx_dipole:
-            # Parse the loop coordinates
-            loop_coords_match = [c for c in split_content if 'LV' in c.upper()]
-            loop_coords = []
-            for match in loop_coords_match:
-                if 'LV' in match:
-                    values = [re.search(r'LV\d+\w:(.*)', m).group(1) for m in match.strip().split(' ')]
-                    loop_coords.append(values)
-            loop_coords = pd.DataFrame(loop_coords, columns=['Easting', 'Northing', 'Elevation']).astype(float)
-            loop_coords.index += 1
-
-            self.loop_coords = loop_coords
-
-        frequencies = content.split(r'/FREQ=')[1].split('\n')[0].split(',')
-        assert frequencies, f"No frequencies found."
-
-        # Data
-        top_section, data_section = content.split(r'/PROFILEX:')
-        data_columns = top_section.split('\n')[-2].split()
-        data_match = data_section.split('\n')[1:]
-
-        # Create the data frame
-        data = pd.DataFrame([match.split() for match in data_match[:-1]], columns=data_columns)
-
-        # Set the attributes
         self.line = header_dict['LINE']
         self.config = header_dict['CONFIG']
         self.elevation = header_dict['ELEV']
-        self.units = re.sub('[()]', '', header_dict['UNITS'])
+        self.units = parse_units(header_dict['UNITS'])
         self.current = header_dict['CURRENT']
 
         if self.rx_dipole:
@@ -372,28 +423,57 @@ class FEMFile:
             self.h_sep = header_dict['SEP']
             self.v_sep = header_dict['VSEP']
 
-        self.frequencies = frequencies
-
-        if 'COMPONENT' not in data.columns:
-            components = content.split(r'/COMPONENTBYFREQ=')[1].split('\n')[0].split(',')
-            if len(components) != len(frequencies):
-                raise ValueError(F"The number of frequencies does not match the components by frequencies.")
-
-            # If all components are the same
-            if all([components[0] == comp for comp in components]):
-                component = components[0]
-                data['COMPONENT'] = component
-                self.components = [component]
-            else:
-                self.comp_by_freq = dict(zip(frequencies, components))
-                self.components = components
-                data['COMPONENT'] = ', '.join(components)
-        else:
+    @staticmethod
+    def _parse_data(top_section, data_text, frequencies):
+        """
+        Parse the data block.
+        :param top_section: str, everything before the /PROFILEX: line. Its last line holds the column names.
+        :param data_text: str, the data rows after the /PROFILEX: line.
+        :param frequencies: list of str, the frequency column names.
+        :return: DataFrame
+        """
+        header_end = top_section.rfind('\n')
+        data_columns = top_section[top_section.rfind('\n', 0, header_end) + 1:header_end].split()
+
+        # The C parser converts the columns directly. The readings are float32, which is plenty for plotting. The
+        # station and coordinates stay float64 to keep their precision, and any other column is left to be inferred.
+        dtypes = {col: np.float32 for col in frequencies if col in data_columns}
+        for col in ['STATION', 'EASTING', 'NORTHING', 'ELEVATION']:
+            if col in data_columns:
+                dtypes[col] = np.float64
+        if 'COMPONENT' in data_columns:
+            dtypes['COMPONENT'] = 'category'
+        return pd.read_csv(StringIO(data_text), sep=r'\s+', header=None, names=data_columns, dtype=dtypes,
+                           engine='c')
+
+    def _parse_components(self, top_section, data):
+        """
+        Set the components, either from the data's COMPONENT column or from /COMPONENTBYFREQ= when the file has
+        one component per frequency. If every frequency has the same component, the COMPONENT column is added to the
+        data. Mixed components are only kept in comp_by_freq, since the rows don't belong to a single component.
+        :param top_section: str, everything before the /PROFILEX: line.
+        :param data: DataFrame
+        """
+        if 'COMPONENT' in data.columns:
             self.components = list(data.COMPONENT.unique())
-        self.data = data
-
-        print(f"Parsed data from {self.filepath.name}:\n{data}")
-        return self
+            return
+
+        comp_pos = top_section.find('/COMPONENTBYFREQ=')
+        if comp_pos == -1:
+            raise ValueError(f"No COMPONENT column or /COMPONENTBYFREQ= line found.")
+        comp_pos += len('/COMPONENTBYFREQ=')
+        components = top_section[comp_pos:top_section.find('\n', comp_pos)].split(',')
+        if len(components) != len(self.frequencies):
+            raise ValueError(F"The number of frequencies does not match the components by frequencies.")
+
+        # If all components are the same
+        if len(set(components)) == 1:
+            component = components[0]
+            data['COMPONENT'] = component
+            self.components = [component]
+        else:
+            self.comp_by_freq = dict(zip(self.frequencies, components))
+            self.components = components
 
 
 if __name__ == '__main__':
@@ -9,6 +9,13 @@ from io import StringIO
 
 from src.file_types.base_tdem_widget import BaseTDEM
 
+# Patterns of Peter's model group files, used for every model and component in IRAPFile.convert
+_GATE_TIME_RE = re.compile(r"\[([^,\]]+),([^\]]+)\]")
+_CONDUCTANCE_RE = re.compile(r"Conductance = (.*);")
+_WHITESPACE_RE = re.compile(r"[\s]")
+_DIMS_RE = re.compile(r"xdim=(.*)ydim=(.*)")
+_COMPONENT_RE = re.compile(r"Outputting Rx component: \d =(\w)")
+
 
 class IRAPTab(BaseTDEM):
 
@@ -80,10 +87,15 @@ class IRAPTab(BaseTDEM):
         channels = [f'{num}' for num in range(1, len(self.file.ch_times) + 1)]
         plotting_channels = channels[self.min_ch.value() - 1: self.max_ch.value()]
 
+        alpha = self.alpha_sbox.value() / 100
+
+        # Split the data by component once, rather than comparing every row for each component
+        comp_groups = {component: comp_data for component, comp_data in self.data.groupby('Component', observed=True)}
+
         for component in self.file.components:
-            comp_data = self.data[self.data.Component == component]
+            comp_data = comp_groups.get(component)
 
-            if comp_data.empty:
+            if comp_data is None or comp_data.empty:
                 print(f"No {component} data in {self.file.filepath.name}.")
                 continue
 
@@ -106,14 +118,14 @@ class IRAPTab(BaseTDEM):
                                         color=self.color,
                                         marker=style,
                                         s=size,
-                                        alpha=self.alpha_sbox.value() / 100,
+                                        alpha=alpha,
                                         label=label)
 
                 else:
                     # style = '--' if 'Q' in freq else '-'
                     artist, = ax.plot(x, y,
                                       color=self.color,
-                                      alpha=self.alpha_sbox.value() / 100,
+                                      alpha=alpha,
                                       # lw=count / 100,
                                       label=label)
 
@@ -156,16 +168,17 @@ class IRAPFile:
             raise ValueError(f"{str(filepath)} is not a file.")
 
         print(f"Converting {filepath.name}")
-        with open(filepath, 'r') as file:
-            content = file.read()
+        content = filepath.read_text()
 
         # waveform_match = re.split(r"Current waveform:", content)[-1].split("DONE")[0].split("\n")
         # waveform = [string.split() for string in waveform_match]
         # waveform = pd.DataFrame(waveform).dropna().iloc[:, 3].astype(float)
 
-        ch_times_match = re.split(r"Gate times in order of output:", content)[-1].split("DONE")[0].split("\n")
-        ch_times_text = pd.Series(np.concatenate([string.split() for string in ch_times_match]))
-        ch_times_text = [re.search(r"\[(.*)\,(.*)\]", time).groups() for time in ch_times_text]
+        # Slice out the gate times block, between the last 'Gate times' marker and the following DONE
+        gates_pos = content.rfind("Gate times in order of output:") + len("Gate times in order of output:")
+        gates_end = content.find("DONE", gates_pos)
+        # Each gate is written as [start,end], so one scan of the block gives every (start, end) pair
+        ch_times_text = _GATE_TIME_RE.findall(content[gates_pos:gates_end if gates_end != -1 else None])
         ch_times = pd.DataFrame.from_records(ch_times_text, columns=["Start", "End"]).astype(float)
         # num_channels = len(waveform)  # Number of off-time channels
 
@@ -175,28 +188,37 @@ class IRAPFile:
 
         # Data
         columns = np.insert(ch_times.index.astype(str), 0, ["Station", "Component"])
-        model_matches = re.split(r"\$\$ MODEL", content)[1:]
+        model_matches = content.split("$$ MODEL")[1:]
         count = 1
         num_files = len(model_matches)
         for model_text in model_matches:
             model_text = model_text.strip()
-            info = model_text.split("\n")[0]
-            name = info.split(":")[0]
-            conductance = float(re.search(r"Conductance = (.*);", info).group(1))
-            x_dim, y_dim = re.search(r"xdim=(.*)ydim=(.*)", re.sub(r"[\s]", "", model_text.split("\n")[0])).groups()
-            data_matches = model_text.split(r"###")[1:]
-            model_data = pd.DataFrame()
+            info = model_text.partition("\n")[0]
+            name = info.partition(":")[0]
+            conductance = float(_CONDUCTANCE_RE.search(info).group(1))
+            x_dim, y_dim = _DIMS_RE.search(_WHITESPACE_RE.sub("", info)).groups()
+            data_matches = model_text.split("###")[1:]
+            frames = []
 
             for data_text in data_matches:
-                component = re.search(r"Outputting Rx component: \d =(\w)", data_text)
+                component = _COMPONENT_RE.search(data_text)
                 if not component:
                     raise ValueError(f"No component found in {filepath.name}.")
                 component = component.group(1).upper()
-                readings = [arr.split() for arr in data_text.split("\n")[1:]]
-                data_df = pd.DataFrame.from_records(readings).dropna().astype(float)
+                # The C parser reads the readings below the component line straight into floats. Blocks with text
+                # lines or ragged rows are read row by row instead, keeping only the complete rows.
+                readings_text = data_text[data_text.find("\n") + 1:]
+                try:
+                    data_df = pd.read_csv(StringIO(readings_text), sep=r'\s+', header=None, dtype=float).dropna()
+                except (ValueError, pd.errors.ParserError):
+                    readings = [arr.split() for arr in readings_text.split("\n")]
+                    data_df = pd.DataFrame.from_records(readings).dropna().astype(float)
                 data_df.insert(1, "Component", component)
                 data_df.columns = columns
-                model_data = model_data.append(data_df)
+                frames.append(data_df)
+
+            # Join the components once, rather than copying the growing frame for every component
+            model_data = pd.concat(frames) if frames else pd.DataFrame()
 
             head = f"Name:{name.upper()} X_Dim:{x_dim} Y_Dim:{y_dim} Conductance:{conductance}"
             ch_times_text = ch_times
@@ -208,8 +230,7 @@ class IRAPFile:
                         F"{model_data.to_string(header=True, index=False)}"
             print(f"Saving {file_name} ({count}/{num_files}).")
 
-            with open(file_name, 'w') as f:
-                f.write(file_text)
+            file_name.write_text(file_text)
             count += 1
 
     def parse(self, filepath):
@@ -223,30 +244,35 @@ class IRAPFile:
             raise ValueError(f"{self.filepath} is not a file.")
 
         print(f"Parsing {self.filepath.name}")
-        with open(filepath, 'r') as file:
-            content = file.read()
+        content = self.filepath.read_text()
 
-        head = content.split("\n")[0].strip().split()
+        head = content[:content.find("\n")].strip().split()
         if head[0] == "":
             raise ValueError(F"{self.filepath.name} is not the correct file format.")
 
-        self.name = re.sub(r"Name:", "", head[0])
-        self.x_dim = re.sub(r"X_Dim:", "", head[1])
-        self.y_dim = re.sub(r"Y_Dim:", "", head[2])
-        self.conductance = re.sub(r"Conductance:", "", head[3])
+        head_dict = {key: value for key, sep, value in (match.partition(':') for match in head) if sep}
+        self.name = head_dict["Name"]
+        self.x_dim = head_dict["X_Dim"]
+        self.y_dim = head_dict["Y_Dim"]
+        self.conductance = head_dict["Conductance"]
 
-        ch_times_text = content.split("### Channel Times ###")[1].split("### Data ###")[0].strip()
+        # Find the section markers once and slice the sections out
+        ch_times_pos = content.find("### Channel Times ###") + len("### Channel Times ###")
+        data_pos = content.find("### Data ###", ch_times_pos)
+        ch_times_text = content[ch_times_pos:data_pos].strip()
         ch_times_io = StringIO(ch_times_text)
-        self.ch_times = pd.read_csv(ch_times_io, delim_whitespace=True)
+        self.ch_times = pd.read_csv(ch_times_io, sep=r'\s+')
 
-        # Data
-        data_text = content.split("### Data ###")[1].strip()
+        # Data. The readings are float32, which is plenty for plotting, and the few components are categorical.
+        data_text = content[data_pos + len("### Data ###"):].strip()
         data_io = StringIO(data_text)
-        self.data = pd.read_csv(data_io, delim_whitespace=True)
         orgi_cols = [str(i) for i in range(len(self.ch_times))]
+        dtypes = {col: np.float32 for col in orgi_cols}
+        dtypes['Component'] = 'category'
+        self.data = pd.read_csv(data_io, sep=r'\s+', dtype=dtypes)
         new_cols = [str(i) for i in range(1, len(self.ch_times) + 1)]
         self.data.rename(columns=dict(zip(orgi_cols, new_cols)), inplace=True)
-        self.components = self.data.Component.unique()
+        self.components = list(self.data.Component.unique())
 
         return self
 
@@ -0,0 +1,40 @@
+import re
+
+import numpy as np
+
+# Brackets around the units in the header, e.g. UNITS:(nT/s)
+_PAREN_RE = re.compile(r'[()]')
+
+
+def parse_units(units):
+    """
+    Remove the brackets around the units of a Maxwell file header.
+    :param units: str, value of the UNITS header token, e.g. (nT/s)
+    :return: str
+    """
+    return _PAREN_RE.sub('', units)
+
+
+def parse_loop_coords(split_content):
+    """
+    Parse the loop vertices of a Maxwell file with a loop transmitter.
+    :param split_content: list of str, lines of the header with the line continuations removed.
+    :return: np array of the easting, northing and elevation of each vertex.
+    """
+    # Each vertex line holds three 'LV<n><E|N|Z>:<value>' tokens. Only lines that start with a vertex token are
+    # split, so the loop name line isn't picked up when the name happens to contain 'LV'.
+    values = [token.partition(':')[2] for line in split_content if line.lstrip().startswith('LV')
+              for token in line.split()]
+    return np.array(values, dtype=float).reshape(-1, 3)
+
+
+def format_loop_coords(loop_coords):
+    """
+    Format the loop vertices as a numbered table for the file information label.
+    :param loop_coords: np array of the easting, northing and elevation of each vertex.
+    :return: str
+    """
+    # A few vertices only, so the table is formatted directly rather than through a DataFrame
+    lines = [f"{'':<3}{'Easting':>12}{'Northing':>12}{'Elevation':>12}"]
+    lines.extend(f"{i:<3}{e:>12.2f}{n:>12.2f}{z:>12.2f}" for i, (e, n, z) in enumerate(loop_coords, start=1))
+    return '\n'.join(lines)
@@ -1,4 +1,6 @@
+import hashlib
 import re
+import zipfile
 from pathlib import Path
 
 import numpy as np
@@ -11,6 +13,11 @@ from PyQt5.QtWidgets import (QLabel)
 from src.file_types.base_tdem_widget import BaseTDEM
 from src.post_process_by_JL import read_em3d_raw, read_observation_line
 
+# Version of the arrays saved in the .npz caches. Bump it when the parser changes, so older caches are parsed again.
+_CACHE_VERSION = 1
+# The least recently used caches are deleted once the cache folder grows past this size
+_CACHE_MAX_BYTES = 512 * 1024 ** 2
+
 
 class MUNTab(BaseTDEM):
 
@@ -21,6 +28,10 @@ class MUNTab(BaseTDEM):
         self.component = component
         self.color = "g"
 
+        # Stations and channel readings of the plotted component, converted once when the file is read
+        self.stations = np.empty(0)
+        self.readings = np.empty((0, 0), dtype=np.float32)
+
     def read(self, filepath):
         if not isinstance(filepath, Path):
             filepath = Path(filepath)
@@ -44,10 +55,7 @@ class MUNTab(BaseTDEM):
         self.layout.addRow('Component', QLabel(self.component))
 
         self.layout.addRow(QLabel("Plot Channels"), self.ch_select_frame)
-        # Create a data frame with channel times and channel widths
-        file.ch_times.name = 'Times'
-        file.ch_times.index += 1
-        self.layout.addRow('Channel Times', QLabel(file.ch_times.to_string()))
+        self.layout.addRow('Channel Times', QLabel(file.ch_times_str))
 
         # Set the channel range spin boxes
         self.min_ch.blockSignals(True)
@@ -59,10 +67,14 @@ class MUNTab(BaseTDEM):
         self.min_ch.blockSignals(False)
         self.max_ch.blockSignals(False)
 
-        self.data = file.data
+        self.data = file.data[file.data.Component == self.component]
         self.file = file
         self.legend_name.setText(f"{self.file.filepath.stem} (MUN)")
 
+        channels = [f'CH{num}' for num in range(1, len(file.ch_times) + 1)]
+        self.stations = self.data.Station.to_numpy(dtype=float)
+        self.readings = self.data.loc[:, channels].to_numpy(dtype=np.float32)
+
     def plot(self):
         """
         Plot the data on a mpl axes
@@ -70,51 +82,42 @@ class MUNTab(BaseTDEM):
         # Remove existing plotted lines
         self.clear()
 
-        channels = [f'{num}' for num in range(1, len(self.file.ch_times) + 1)]
-        plotting_channels = channels[self.min_ch.value() - 1: self.max_ch.value()]
-
-        data = self.data
-
-        if data.empty:
+        if self.data.empty:
             print(f"No {self.component} data in {self.file.filepath.name}.")
             return
 
-        size = 8  # For scatter point size
-
-        for ind, ch in enumerate(plotting_channels):
-            if ind == 0:
-                label = self.legend_name.text()
-            else:
-                label = None
-
-            x = data.Station.astype(float) + self.shift_stations_sbox.value()
-            y = data.loc[:, ch].astype(float) * self.scale_data_sbox.value()
-
-            if len(x) == 1:
-                style = 'o'
-                artist = self.axes[self.component].scatter(x, y,
-                                                           color=self.color,
-                                                           marker=style,
-                                                           s=size,
-                                                           alpha=self.alpha_sbox.value() / 100,
-                                                           label=label)
-
-            else:
-                # style = '--' if 'Q' in freq else '-'
-                artist, = self.axes[self.component].plot(x, y,
-                                                         color=self.color,
-                                                         alpha=self.alpha_sbox.value() / 100,
-                                                         # lw=count / 100,
-                                                         label=label)
-
-            if self.component == 'X':
-                self.x_artists.append(artist)
-            elif self.component == 'Y':
-                self.y_artists.append(artist)
-            else:
-                self.z_artists.append(artist)
+        x = self.stations + self.shift_stations_sbox.value()
+        # The plotted channel window, sliced by position so no channel names are built
+        channel_data = self.readings[:, self.min_ch.value() - 1: self.max_ch.value()] * self.scale_data_sbox.value()
+        ax = self.axes[self.component]
+        alpha = self.alpha_sbox.value() / 100
+
+        # Every channel is drawn by a single matplotlib call, and only the first artist is labelled for the legend
+        if len(x) == 1:
+            # One scatter for all channels, the point size still grows with the channel number
+            sizes = 8 + 2 * np.arange(channel_data.shape[1])
+            artists = [ax.scatter(np.repeat(x, channel_data.shape[1]), channel_data[0],
+                                  color=self.color,
+                                  marker='o',
+                                  s=sizes,
+                                  alpha=alpha,
+                                  label=self.legend_name.text())]
 
-            size += 2
+        else:
+            # style = '--' if 'Q' in freq else '-'
+            artists = ax.plot(x, channel_data,
+                              color=self.color,
+                              # lw=count / 100,
+                              alpha=alpha)
+            if artists:
+                artists[0].set_label(self.legend_name.text())
+
+        if self.component == 'X':
+            self.x_artists.extend(artists)
+        elif self.component == 'Y':
+            self.y_artists.extend(artists)
+        else:
+            self.z_artists.extend(artists)
 
         self.plot_changed_sig.emit()
 
@@ -123,6 +126,8 @@ class MUNFile:
     """
     MUN 3D TEM file object
     """
+    # Only the parse results are stored, so instances are kept without an instance __dict__
+    __slots__ = ('filepath', 'data_type', 'units', 'ch_times', 'ch_times_str', 'data')
 
     def __init__(self):
         self.filepath = None
@@ -130,6 +135,7 @@ class MUNFile:
         self.data_type = None
         self.units = None
         self.ch_times = pd.Series(dtype=float)
+        self.ch_times_str = ''  # Numbered channel times, formatted once for the channel times label
         self.data = pd.DataFrame()
 
     @staticmethod
@@ -144,6 +150,10 @@ class MUNFile:
         """
 
         def get_field_data(data_folder, channels, primary_field=False):
+            """
+            Read the 3D response of a model folder.
+            :return: tuple, 1D array of the station positions and the 3D field array.
+            """
             # read the primary 3D response
             field_filename = data_folder.joinpath(r'iTr=001_dBdt.dat')
             channel_file = data_folder.joinpath(r'time_stepping_scheme.txt')
@@ -167,21 +177,18 @@ class MUNFile:
                 # when asking primary fields over more than 1 period
                 timebase = 50.e-3  # msec
                 ramp = 1.5e-3  # msec, linear ramp off
-                nch_total = channels.size
-                nch_redueced_1t = np.zeros(nch_total)  # shifted time channels
 
                 period = timebase * 4.0
-                for k in range(nch_total):
-                    nch_redueced_1t[k] = (channels[k] + timebase + ramp)  # t=-51.5 ms is the beginning of everything
-                    ratio = nch_redueced_1t[k] / period
-                    nch_redueced_1t[k] = nch_redueced_1t[k] - np.floor(ratio) * period
+                # Shifted time channels, folded back into the first period
+                nch_redueced_1t = channels + timebase + ramp  # t=-51.5 ms is the beginning of everything
+                nch_redueced_1t -= np.floor(nch_redueced_1t / period) * period
 
                 channels = nch_redueced_1t - (timebase + ramp)
 
             # Read in the 3D modeled response. 3D data unit: T/s
             field_3d = read_em3d_raw(str(field_filename), n_rec, n_iters, channels, str(channel_file),
                                      ZeroTimeShift=None, interp=False)
-            return field_3d
+            return stn, field_3d
 
         def write_time_decay_files(channels, stations, fieldx, fieldy, fieldz, out_path):
             """
@@ -197,14 +204,14 @@ class MUNFile:
             with open(out_path, 'w') as file:
 
                 num_stations, num_channels = fieldx.shape
-                station_names = [f"{i + 1}" for i in stations]
-                station_names = [f"{i:^8}" for i in station_names]
+                # The station numbers are cast to str as one array, only the padding is done per station
+                station_names = [f"{i:^8}" for i in (stations + 1).astype(str)]
                 channel_names = [f"CH{i + 1}" for i in range(len(channels))]
                 channel_names = [f"{i:^15}" for i in channel_names]
 
                 file.write("Data type: dB/dt; UNIT: nT/s\n")
                 file.write(f"Number of stations: {num_stations}\n")
-                file.write(f"Stations (m): {' '.join([str(s) for s in stations]):^10}\n")
+                file.write(f"Stations (m): {' '.join(stations.astype(str)):^10}\n")
                 file.write(f"Channel times (ms):\n")
 
                 # Add the channel times
@@ -216,13 +223,14 @@ class MUNFile:
 
                 # Add the data
                 print(f"Stations {stations.min()} - {stations.max()}")
-                for i in range(num_stations):
-                    x = [f"{x:^ 15.5E}" for x in fieldx[i, :]]
-                    y = [f"{x:^ 15.5E}" for x in fieldy[i, :]]
-                    z = [f"{x:^ 15.5E}" for x in fieldz[i, :]]
-                    file.write(f"{station_names[i]:^8}{'X':^8}{''.join(x)}\n")
-                    file.write(f"{station_names[i]:^8}{'Y':^8}{''.join(y)}\n")
-                    file.write(f"{station_names[i]:^8}{'Z':^8}{''.join(z)}\n")
+                # One format string per row, and a single write for the whole block
+                row_format = "{:^8}{:^8}" + "{:^ 15.5E}" * num_channels + "\n"
+                lines = []
+                for name, x, y, z in zip(station_names, fieldx.tolist(), fieldy.tolist(), fieldz.tolist()):
+                    lines.append(row_format.format(name, 'X', *x))
+                    lines.append(row_format.format(name, 'Y', *y))
+                    lines.append(row_format.format(name, 'Z', *z))
+                file.write(''.join(lines))
 
         folder = Path(folder)
         if primary_folder is None:
@@ -252,21 +260,20 @@ class MUNFile:
                              53.9250, 55.7050, 58.0700, 61.1600, 71.2300, 87.8950, 97.1150])
         channels = channels * 1e-3
 
-        field_pri_3d = get_field_data(primary_folder, channels, primary_field=True)
+        _, field_pri_3d = get_field_data(primary_folder, channels, primary_field=True)
 
         for data_folder in data_results:
             print(f"Converting {data_folder}.")
             print(f"Using primary folder {primary_folder}")
 
-            obs_filename = data_folder.joinpath(r'iTr=001_observation_points_coordinates.xyz')
-            stn = read_observation_line(str(obs_filename), whichColumn=2)
-
-            # Read in the 3D modeled response. 3D data unit: T/s
-            field_3d = get_field_data(data_folder, channels, primary_field=False)
+            # Read in the 3D modeled response. 3D data unit: T/s. The stations come back with it, so the observation
+            # points file is only read once per folder.
+            stn, field_3d = get_field_data(data_folder, channels, primary_field=False)
 
             assert len(stn) == field_3d.shape[1], f"Number of stations is not equal to size of field_3d ({len(stn)} vs {field_3d.shape[1]})"
-            field_3d = field_3d - field_pri_3d
-            field_3d = field_3d * 1e+9  # For nT
+            # field_3d is a fresh array from read_em3d_raw, so it is updated in place
+            field_3d -= field_pri_3d
+            field_3d *= 1e+9  # For nT
 
             if output_folder is None:
                 output_folder = folder
@@ -289,7 +296,7 @@ class MUNFile:
                 """ Aspect Ratio naming END """
 
                 out_path = output_folder.joinpath(data_folder.parent.name).with_suffix(".DAT")
-                out_name = re.sub("m", letter, out_path.name)
+                out_name = out_path.name.replace("m", letter)
                 out_path = out_path.with_name(out_name)
             else:
                 out_path = output_folder.joinpath(data_folder.parent.name).with_suffix(".DAT")
@@ -310,29 +317,115 @@ class MUNFile:
         if not self.filepath.is_file():
             raise ValueError(f"{self.filepath} is not a file.")
 
+        # Re-use the arrays saved by a previous parse, but only if they were saved from this exact version of the file
+        stat = self.filepath.stat()
+        stamp = np.array([stat.st_mtime_ns, stat.st_size], dtype=np.int64)
+        cache = _cache_path(self.filepath)
+        if cache.is_file():
+            try:
+                if self._load_cache(cache, stamp):
+                    # Mark the cache as recently used, so it is among the last to be deleted when the folder is pruned
+                    os.utime(cache)
+                    return self
+            except (OSError, ValueError, KeyError, zipfile.BadZipFile) as e:
+                print(f"Could not load the cached data of {self.filepath.name}, parsing the file instead: {e}")
+
         print(f"Parsing {self.filepath.name}")
-        with open(filepath, 'r') as file:
-            content = file.read()
-            split_content = content.split('\n')
-
-        header = split_content[0].split('; ')
-        self.data_type = header[0]
-        self.units = re.sub(r'UNIT:', '', header[1]).strip()
-        channels = content.split(r"Channel times (ms):")[-1].split(r"EM data:")[0].strip()
-        self.ch_times = pd.Series([c.split()[-1] for c in channels.split("\n")], dtype=float)
-
-        # Data
-        data_match = content.split("EM data:\n")[-1].split("\n")
-        data_match = [d.split() for d in data_match]
-        data = pd.DataFrame.from_records(data_match).dropna()
-        # Use the first row as the column names, then remove the first row
-        data.columns = data.iloc[0]
-        data.drop(axis=0, index=0, inplace=True)
-        data.iloc[:, 2:] = data.iloc[:, 2:].astype(float)
-        self.data = data
+        # The header is read line by line and the data block is streamed from the same file into read_csv, so the
+        # whole file is never held in memory as one string
+        with open(self.filepath, 'r') as file:
+            header = file.readline().split('; ')
+            self.data_type = header[0]
+            self.units = header[1].replace('UNIT:', '').strip()
+
+            line = file.readline()
+            while line and not line.startswith("Channel times (ms):"):
+                line = file.readline()
+
+            ch_times = []
+            line = file.readline()
+            while line and not line.startswith("EM data:"):
+                if line.strip():
+                    ch_times.append(line.split()[-1])
+                line = file.readline()
+            self.ch_times = pd.Series(ch_times, dtype=float)
+            self.ch_times_str = self._format_ch_times()
+
+            # Data. The C parser reads the readings straight into float32, which is plenty for plotting.
+            columns = file.readline().split()
+            dtypes = {col: np.float32 for col in columns[2:]}
+            dtypes[columns[1]] = str
+            data = pd.read_csv(file, sep=r'\s+', header=None, names=columns, dtype=dtypes, engine='c').dropna()
+        self._set_data(columns,
+                       data.iloc[:, 0].to_numpy(dtype=float),
+                       data.iloc[:, 1].to_numpy(),
+                       data.iloc[:, 2:].to_numpy(dtype=np.float32))
         # print(f"Parsed data from {self.filepath.name}:\n{data}")
+        self._save_cache(cache, stamp)
         return self
 
+    def _format_ch_times(self):
+        """
+        Number the channel times from 1, one channel per line.
+        :return: str
+        """
+        return '\n'.join(f'{i + 1:<4}{t:.6g}' for i, t in enumerate(self.ch_times.to_numpy()))
+
+    def _save_cache(self, cache, stamp):
+        """
+        Save the parsed file as numpy arrays, so the next parse can skip the text parsing.
+        :param cache: Path of the .npz file.
+        :param stamp: int64 array of the source file's st_mtime_ns and st_size.
+        """
+        try:
+            cache.parent.mkdir(parents=True, exist_ok=True)
+            np.savez(cache,
+                     version=np.array([_CACHE_VERSION]),
+                     source=np.array([str(self.filepath.resolve())]),
+                     stamp=stamp,
+                     header=np.array([self.data_type, self.units]),
+                     ch_times=self.ch_times.to_numpy(dtype=float),
+                     columns=np.array(self.data.columns, dtype=str),
+                     stations=self.data.iloc[:, 0].to_numpy(dtype=float),
+                     components=self.data.iloc[:, 1].to_numpy(dtype=str),
+                     readings=self.data.iloc[:, 2:].to_numpy(dtype=np.float32))
+        except OSError as e:
+            print(f"Could not save the cached data of {self.filepath.name}: {e}")
+        else:
+            _prune_cache(cache.parent)
+
+    def _load_cache(self, cache, stamp):
+        """
+        Set the attributes from the arrays saved by _save_cache.
+        :param cache: Path of the .npz file.
+        :param stamp: int64 array of the source file's current st_mtime_ns and st_size.
+        :return: bool, False if the cache was saved by a different version of the parser, from a different file or from
+        a different version of the file.
+        """
+        with np.load(cache) as arrays:
+            if 'version' not in arrays.files or arrays['version'][0] != _CACHE_VERSION:
+                return False
+            if arrays['source'][0] != str(self.filepath.resolve()) or not np.array_equal(arrays['stamp'], stamp):
+                return False
+            self.data_type, self.units = arrays['header'].tolist()
+            self.ch_times = pd.Series(arrays['ch_times'])
+            self.ch_times_str = self._format_ch_times()
+            self._set_data(arrays['columns'].tolist(), arrays['stations'], arrays['components'], arrays['readings'])
+        return True
+
+    def _set_data(self, columns, stations, components, readings):
+        """
+        Build the data frame from the readings matrix, so all the channels are kept in a single float32 block.
+        :param columns: list of str, the Station, Component and channel column names.
+        :param stations: 1D array of station numbers.
+        :param components: 1D array of component names.
+        :param readings: 2D float32 array, one column per channel.
+        """
+        data = pd.DataFrame(readings, columns=columns[2:])
+        data.insert(0, columns[0], stations)
+        data.insert(1, columns[1], pd.Series(components, dtype=str))
+        self.data = data
+
     def get_range(self, start_ch=None, end_ch=None):
         if start_ch is None:
             start_ch = 1
@@ -346,6 +439,43 @@ class MUNFile:
         return mn, mx
 
 
+def _cache_path(filepath):
+    """
+    Path of the .npz cache of a MUN file. The caches are kept in the user's cache folder, named after the file's full
+    path, so nothing is written next to the data.
+    :param filepath: Path
+    :return: Path
+    """
+    cache_folder = Path(os.environ.get('LOCALAPPDATA') or Path.home().joinpath('.cache'))
+    name = hashlib.sha1(str(filepath.resolve()).encode()).hexdigest()
+    return cache_folder.joinpath('IRAP_Modelling', 'mun_cache', name).with_suffix('.npz')
+
+
+def _prune_cache(folder):
+    """
+    Delete the least recently used caches until the cache folder is no bigger than _CACHE_MAX_BYTES.
+    :param folder: Path of the cache folder.
+    """
+    caches = []
+    for cache in folder.glob('*.npz'):
+        try:
+            stat = cache.stat()
+        except OSError:
+            continue
+        caches.append((stat.st_mtime_ns, stat.st_size, cache))
+
+    total = sum(size for _, size, _ in caches)
+    for _, size, cache in sorted(caches):
+        if total <= _CACHE_MAX_BYTES:
+            break
+        try:
+            cache.unlink()
+        except OSError as e:
+            print(f"Could not delete the cached data {cache.name}: {e}")
+            continue
+        total -= size
+
+
 if __name__ == '__main__':
     parser = MUNFile()
 
@@ -77,6 +77,8 @@ class PlateFTab(BaseTDEM):
         channels = [f'{num}' for num in range(1, len(self.file.ch_times) + 1)]
         plotting_channels = channels[self.min_ch.value() - 1: self.max_ch.value()]
 
+        alpha = self.alpha_sbox.value() / 100
+
         for component in self.file.components:
             comp_data = self.data[self.data.Component == component]
 
@@ -87,6 +89,7 @@ class PlateFTab(BaseTDEM):
             size = 8  # For scatter point size
 
             ax = self.axes[component]
+            x, channel_data = self.get_plotting_data(comp_data, 'Station', plotting_channels)
 
             for ind, ch in enumerate(plotting_channels):
                 if ind == 0:
@@ -94,8 +97,7 @@ class PlateFTab(BaseTDEM):
                 else:
                     label = None
 
-                x = comp_data.Station.astype(float) + self.shift_stations_sbox.value()
-                y = comp_data.loc[:, ch].astype(float) * self.scale_data_sbox.value()
+                y = channel_data[:, ind]
 
                 if len(x) == 1:
                     style = 'o'
@@ -103,14 +105,14 @@ class PlateFTab(BaseTDEM):
                                         color=self.color,
                                         marker=style,
                                         s=size,
-                                        alpha=self.alpha_sbox.value() / 100,
+                                        alpha=alpha,
                                         label=label)
 
                 else:
                     # style = '--' if 'Q' in freq else '-'
                     artist, = ax.plot(x, y,
                                       color=self.color,
-                                      alpha=self.alpha_sbox.value() / 100,
+                                      alpha=alpha,
                                       # lw=count / 100,
                                       label=label)
 
@@ -148,9 +150,8 @@ class PlateFFile:
             raise ValueError(f"{self.filepath} is not a file.")
 
         print(f"Parsing {self.filepath.name}")
-        with open(filepath, 'r') as file:
-            content = file.read()
-            split_content = content.split('\n')
+        content = self.filepath.read_text()
+        split_content = content.split('\n')
 
         # The top two lines of headers
         data_start = int(split_content[1].split()[0])
@@ -167,12 +168,12 @@ class PlateFFile:
         data_match = np.array(' '.join(split_content[data_start:]).split())
         data_match = np.reshape(data_match, (int(len(data_match) / (num_channels + 3)), num_channels + 3))
 
-        # Create a data frame
-        cols = ['Station', 'Component', '0']
+        # Create a data frame. The readings are converted to float in one pass, straight from the token array.
+        cols = ['0']
         cols.extend(np.arange(1, num_channels + 1).astype(str))
-        data = pd.DataFrame(data_match, columns=cols)
-        data.iloc[:, 0] = data.iloc[:, 0].astype(float).astype(int)
-        data.iloc[:, 2:] = data.iloc[:, 2:].astype(float)
+        data = pd.DataFrame(data_match[:, 2:].astype(float), columns=cols)
+        data.insert(0, 'Station', data_match[:, 0].astype(float).astype(int))
+        data.insert(1, 'Component', data_match[:, 1])
 
         # Set the attributes
         self.data = data
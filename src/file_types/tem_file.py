@@ -1,5 +1,6 @@
 import re
 import os
+from io import StringIO
 from pathlib import Path
 
 import numpy as np
@@ -8,6 +9,7 @@ from PyQt5.QtWidgets import (QLabel)
 from natsort import natsorted
 
 from src.file_types.base_tdem_widget import BaseTDEM
+from src.file_types.maxwell_header import format_loop_coords, parse_loop_coords, parse_units
 
 
 class TEMTab(BaseTDEM):
@@ -77,8 +79,8 @@ class TEMTab(BaseTDEM):
         self.min_ch.blockSignals(False)
         self.max_ch.blockSignals(False)
 
-        if not file.loop_coords.empty:
-            self.layout.addRow('Loop Coordinates', QLabel(file.loop_coords.to_string()))
+        if file.loop_coords.size:
+            self.layout.addRow('Loop Coordinates', QLabel(format_loop_coords(file.loop_coords)))
 
         self.data = file.data
         self.file = file
@@ -99,6 +101,8 @@ class TEMTab(BaseTDEM):
         channels = [f'CH{num}' for num in range(1, len(self.file.ch_times) + 1)]
         plotting_channels = channels[self.min_ch.value() - 1: self.max_ch.value()]
 
+        alpha = self.alpha_sbox.value() / 100
+
         for component in self.file.components:
             comp_data = self.data[self.data.COMPONENT == component]
 
@@ -108,6 +112,7 @@ class TEMTab(BaseTDEM):
 
             size = 8  # For scatter point size
             ax = self.axes[component]
+            x, channel_data = self.get_plotting_data(comp_data, 'STATION', plotting_channels)
 
             for ind, ch in enumerate(plotting_channels):
                 # If coloring by channel, uses the rainbow color iterator and the label is the channel number.
@@ -116,8 +121,7 @@ class TEMTab(BaseTDEM):
                 else:
                     label = None
 
-                x = comp_data.STATION.astype(float) + self.shift_stations_sbox.value()
-                y = comp_data.loc[:, ch].astype(float) * self.scale_data_sbox.value()
+                y = channel_data[:, ind]
 
                 if len(x) == 1:
                     style = 'o'
@@ -125,14 +129,14 @@ class TEMTab(BaseTDEM):
                                         color=self.color,
                                         marker=style,
                                         s=size,
-                                        alpha=self.alpha_sbox.value() / 100,
+                                        alpha=alpha,
                                         label=label)
 
                 else:
                     # style = '--' if 'Q' in freq else '-'
                     artist, = ax.plot(x, y,
                                       color=self.color,
-                                      alpha=self.alpha_sbox.value() / 100,
+                                      alpha=alpha,
                                       # lw=count / 100,
                                       label=label)
 
@@ -161,6 +165,8 @@ class TEMTab(BaseTDEM):
         channels = [f'CH{num}' for num in range(1, len(self.file.ch_times) + 1)]
         plotting_channels = channels[self.min_ch.value() - 1: self.max_ch.value()]
 
+        alpha = self.alpha_sbox.value() / 100
+
         for component in self.file.components:
             comp_data = self.data[self.data.COMPONENT == component]
 
@@ -171,31 +177,30 @@ class TEMTab(BaseTDEM):
             size = 8  # For scatter point size
 
             ax = self.axes[component]
+            x = comp_data.STATION.to_numpy(dtype=float)
+            channel_data = comp_data.loc[:, plotting_channels].to_numpy(dtype=float)
 
-            for ind, ch in enumerate(plotting_channels):
+            for ind, y in enumerate(channel_data.T):
                 # If coloring by channel, uses the rainbow color iterator and the label is the channel number.
                 if ind == 0:
                     label = f"{self.file.filepath.stem} (Maxwell)"
                 else:
                     label = None
 
-                x = comp_data.STATION.astype(float)
-                y = comp_data.loc[:, ch].astype(float)
-
                 if len(x) == 1:
                     style = 'o'
                     artist = ax.scatter(x, y,
                                         color=self.color,
                                         marker=style,
                                         s=size,
-                                        alpha=self.alpha_sbox.value() / 100,
+                                        alpha=alpha,
                                         label=label)
 
                 else:
                     # style = '--' if 'Q' in freq else '-'
                     artist, = ax.plot(x, y,
                                       color=self.color,
-                                      alpha=self.alpha_sbox.value() / 100,
+                                      alpha=alpha,
                                       # lw=count / 100,
                                       label=label)
 
@@ -240,7 +245,7 @@ class TEMFile:
         self.rx_dipole = False
         self.tx_dipole = False
         self.tx_moment = None  # Not sure if needed
-        self.loop_coords = pd.DataFrame(columns=['Easting', 'Northing', 'Elevation'], dtype=float)
+        self.loop_coords = np.empty((0, 3))  # Easting, Northing, Elevation of each loop vertex
         self.ch_times = []
         self.ch_widths = []
         self.data = pd.DataFrame()
@@ -252,57 +257,50 @@ class TEMFile:
             raise ValueError(f"{self.filepath} is not a file.")
 
         print(f"Parsing {self.filepath.name}")
-        with open(filepath, 'r') as file:
-            self.content = file.read()
-            split_content = re.sub(' &', '', self.content).split('\n')
+        self.content = self.filepath.read_text()
 
-        if re.search(r"LOOP:", self.content):
-            header = self.content.split(r"LOOP:")[0].split("\n")[1:]
-        else:
-            header = self.content.split(r"/TIMES(ms)")[0].split("\n")[1:]
+        # The loop vertices are in the header, so the data block isn't split into lines or scanned for 'LV'
+        split_content = self.content[:self.content.find(r'/PROFILEX:')].replace(' &', '').splitlines()
+
+        # The header ends at the loop name, or at the channel times for dipole transmitters
+        header_end = self.content.find(r"LOOP:")
+        if header_end == -1:
+            header_end = self.content.find(r"/TIMES(ms)")
+        header = self.content[:header_end].split("\n")[1:]
         header = np.concatenate([h.split() for h in header])
-        header_dict = {}
-        for match in header:
-            if match.strip() == "&":
-                continue
-            value = match.split(':')
-            header_dict[value[0]] = value[1]
+        # Split each token on its first colon only. Tokens without one, such as the '&' continuations, are skipped.
+        header_dict = {key: value for key, sep, value in (match.partition(':') for match in header) if sep}
 
         self.rx_dipole = True if header_dict['RXDIPOLE'] == 'YES' else False
         self.tx_dipole = True if header_dict['TXDIPOLE'] == 'YES' else False
 
         if not self.tx_dipole:
-            # Parse the loop coordinates
-            loop_coords_match = [c for c in split_content if 'LV' in c.upper()]
-            loop_coords = []
-            for match in loop_coords_match:
-                if 'LV' in match:
-                    values = [re.search(r'LV\d+\w:(.*)', m).group(1) for m in match.strip().split(' ')]
-                    loop_coords.append(values)
-            loop_coords = pd.DataFrame(loop_coords, columns=['Easting', 'Northing', 'Elevation']).astype(float)
-            loop_coords.index += 1
-
-            self.loop_coords = loop_coords
-
-        # Channel times and widths
-        ch_times = np.array(self.content.split(r'/TIMES(')[1].split('\n')[0][4:].split(','), dtype=float)
-        ch_widths = np.array(self.content.split(r'/TIMESWIDTH(')[1].split('\n')[0][4:].split(','), dtype=float)
+            self.loop_coords = parse_loop_coords(split_content)
+
+        # Channel times and widths. Only their lines are sliced out, skipping the '(ms)=' units.
+        times_pos = self.content.find(r'/TIMES(') + len(r'/TIMES(')
+        widths_pos = self.content.find(r'/TIMESWIDTH(') + len(r'/TIMESWIDTH(')
+        ch_times = np.array(self.content[times_pos:self.content.find('\n', times_pos)][4:].split(','), dtype=float)
+        ch_widths = np.array(self.content[widths_pos:self.content.find('\n', widths_pos)][4:].split(','), dtype=float)
 
         # Data
-        top_section, data_section = self.content.split(r'/PROFILEX:')
-        data_columns = top_section.split('\n')[-2].split()
-        data_match = data_section.split('\n')[1:]
-        data = pd.DataFrame([match.split() for match in data_match[:-1]], columns=data_columns)
-        data.iloc[:, 0:3] = data.iloc[:, 0:3].astype(float)
-        data.iloc[:, 3] = data.iloc[:, 3].astype(float).astype(int)
-        data.iloc[:, 4] = data.iloc[:, 4].astype(str)
-        data.iloc[:, 5:] = data.iloc[:, 5:].astype(float)
+        profile_pos = self.content.find(r'/PROFILEX:')
+        header_end = self.content.rfind('\n', 0, profile_pos)
+        data_columns = self.content[self.content.rfind('\n', 0, header_end) + 1:header_end].split()
+        data_io = StringIO(self.content[self.content.find('\n', profile_pos) + 1:])
+
+        # Station, easting, northing, NCH, component, then the channels. The types are set while parsing, except for
+        # NCH which is read as a float (in case it's written with decimals) and made an int.
+        dtypes = {col: float for col in data_columns}
+        dtypes[data_columns[4]] = str
+        data = pd.read_csv(data_io, sep=r'\s+', header=None, names=data_columns, dtype=dtypes, engine='c')
+        data[data_columns[3]] = data[data_columns[3]].astype(int)
 
         # Set the attributes
         self.line = header_dict['LINE']
         self.config = header_dict['CONFIG']
         self.elevation = header_dict['ELEV']
-        self.units = re.sub('[()]', '', header_dict['UNITS'])
+        self.units = parse_units(header_dict['UNITS'])
         self.current = header_dict['CURRENT']
         self.tx_turns = header_dict['TXTURNS']
         self.base_freq = header_dict['BFREQ']
@@ -343,13 +341,17 @@ class TEMFile:
 
         print(F"Saving new TEM file to {filepath}.")
 
-        header = self.content.split(r"/PROFILEX")[0].split("\n")[-2]
+        # The column names are on the line above /PROFILEX. Slice it out rather than splitting the whole file.
+        profile_pos = self.content.find("/PROFILEX")
+        header_end = self.content.rfind("\n", 0, profile_pos)
+        header_start = self.content.rfind("\n", 0, header_end) + 1
+        header = self.content[header_start:header_end]
         profile_ex = re.search(r"(/PROFILEX:\w+)", self.content).group(1)
         # Remove first header_str character because pandas to_string creates the first column with space 14 but rest 15.
         header_str = ''.join([f"{h:>15}" for h in header.split()])[1:]
         data_str = self.data.to_string(header=False, index=False, col_space=14, justify='right')
 
-        self.content = self.content.split(header)[0]
+        self.content = self.content[:header_start]
         self.content += f"{header_str}\n{profile_ex}\n{data_str}"
 
         with open(filepath, "w+") as file:
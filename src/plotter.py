@@ -56,7 +56,6 @@ test_runnerUI, _ = uic.loadUiType(TestRunnerUIFile)
 matplotlib.use('Qt5Agg')
 # matplotlib.rc('lines', color='gray')
 
-rainbow_colors = iter(cm.rainbow(np.linspace(0, 1, 20)))
 quant_colors = np.nditer(np.array(plt.rcParams['axes.prop_cycle'].by_key()['color']))
 
 # iter_colors = np.nditer(quant_colors)
@@ -131,7 +130,8 @@ class FEMPlotter(QMainWindow, fem_plotterUI):
         self.setWindowIcon(QtGui.QIcon(str(icons_path.joinpath('fem_plotter.png'))))
         self.err_msg = QErrorMessage()
         self.msg = QMessageBox()
-        self.opened_files = []
+        self.opened_files = []  # In tab order
+        self.opened_paths = set()  # For fast lookup of already opened files
 
         # HCP Figure
         self.hcp_figure = Figure()
@@ -270,7 +270,7 @@ class FEMPlotter(QMainWindow, fem_plotterUI):
             print(f"{ext} is not supported.")
             return
 
-        elif filepath in self.opened_files:
+        elif filepath in self.opened_paths:
             print(f"{filepath.name} is already opened.")
             return
 
@@ -312,6 +312,7 @@ class FEMPlotter(QMainWindow, fem_plotterUI):
         self.plot_tab(tab)
 
         self.opened_files.append(filepath)
+        self.opened_paths.add(filepath)
         self.update_num_files()
 
     def plot_tab(self, tab):
@@ -345,7 +346,7 @@ class FEMPlotter(QMainWindow, fem_plotterUI):
         # Find the tab when an index is passed (when a tab is closed)
         tab = self.file_tab_widget.widget(ind).widget()
         tab.clear()
-        self.opened_files.pop(ind)
+        self.opened_paths.discard(self.opened_files.pop(ind))
         self.file_tab_widget.removeTab(ind)
 
         self.update_legend()
@@ -412,7 +413,8 @@ class TEMPlotter(QMainWindow, tem_plotterUI):
         self.setWindowIcon(QtGui.QIcon(str(icons_path.joinpath('tem_plotter.png'))))
         self.err_msg = QErrorMessage()
         self.msg = QMessageBox()
-        self.opened_files = []
+        self.opened_files = []  # In tab order
+        self.opened_paths = set()  # For fast lookup of already opened files
 
         # X Figure
         self.x_figure = Figure()
@@ -585,7 +587,7 @@ class TEMPlotter(QMainWindow, tem_plotterUI):
             print(f"{ext} is not supported.")
             return
 
-        elif filepath in self.opened_files:
+        elif filepath in self.opened_paths:
             print(f"{filepath.name} is already opened.")
             return
 
@@ -605,7 +607,8 @@ class TEMPlotter(QMainWindow, tem_plotterUI):
         if ext == '.tem':
             tab = TEMTab(parent=self, axes=axes)
         elif ext == '.dat':
-            first_line = open(filepath).readlines()[0]
+            with open(filepath) as file:
+                first_line = file.readline()
             if 'Data type:' in first_line:
                 components = ("X", "Y", "Z")
                 component, ok_pressed = QInputDialog.getItem(self, "Choose Component", "Component:", components, 0,
@@ -640,6 +643,7 @@ class TEMPlotter(QMainWindow, tem_plotterUI):
         self.plot_tab(tab)
 
         self.opened_files.append(filepath)
+        self.opened_paths.add(filepath)
         self.update_num_files()
 
     def plot_tab(self, tab):
@@ -668,7 +672,7 @@ class TEMPlotter(QMainWindow, tem_plotterUI):
         # Find the tab when an index is passed (when a tab is closed)
         tab = self.file_tab_widget.widget(ind).widget()
         tab.clear()
-        self.opened_files.pop(ind)
+        self.opened_paths.discard(self.opened_files.pop(ind))
         self.file_tab_widget.removeTab(ind)
 
         self.update_legend()
@@ -692,8 +696,9 @@ class TEMPlotter(QMainWindow, tem_plotterUI):
                 if legend:
                     legend.remove()
 
-            canvas.draw()
-            canvas.flush_events()
+            # Both this and update_ax_scales run on every plot_changed_sig, so the canvases are only asked to
+            # redraw once the event loop is idle, and the two requests collapse into one draw.
+            canvas.draw_idle()
 
     def update_ax_scales(self):
         """Auto re-scale every plot"""
@@ -702,8 +707,7 @@ class TEMPlotter(QMainWindow, tem_plotterUI):
             ax.autoscale()
 
         for canvas in self.canvases:
-            canvas.draw()
-            canvas.flush_events()
+            canvas.draw_idle()
 
     def update_num_files(self):
         self.num_files_label.setText(f"{len(self.opened_files)} file(s) opened.")
@@ -967,6 +971,22 @@ class TestRunner(QMainWindow, test_runnerUI):
         :param plotting_files: dict
         :param pdf_filepath: str
         """
+        parsed_files = {}
+        irap_components = {}  # IRAP data split by component, by filepath. Cleared with parsed_files.
+
+        def parse_file(parser, filepath):
+            """
+            Parse a file only once per set, since each file is plotted for every component. parsed_files is cleared for
+            every set, so only the files of the current set are kept in memory.
+            :param parser: file class used to parse the file, e.g. TEMFile
+            :param filepath: Path object
+            :return: parsed file object
+            """
+            stat = Path(filepath).stat()
+            key = (str(filepath), stat.st_mtime_ns, stat.st_size)
+            if key not in parsed_files:
+                parsed_files[key] = parser().parse(filepath)
+            return parsed_files[key]
 
         def plot_maxwell(filepath, component):
             """
@@ -974,8 +994,7 @@ class TestRunner(QMainWindow, test_runnerUI):
             :param filepath: Path object
             :param component: Str, either X, Y, or Z.
             """
-            parser = TEMFile()
-            file = parser.parse(filepath)
+            file = parse_file(TEMFile, filepath)
 
             print(f"Plotting {filepath.name}.")
             properties = self.get_plotting_info('Maxwell')  # Plotting properties
@@ -997,7 +1016,10 @@ class TestRunner(QMainWindow, test_runnerUI):
             max_ch = min(properties['ch_end'] - 1, len(channels) - 1)
             plotting_channels = channels[min_ch: max_ch + 1]
 
-            for ind, ch in enumerate(plotting_channels):
+            x = comp_data.STATION.to_numpy(dtype=float) + properties['station_shift']
+            channel_data = comp_data.loc[:, plotting_channels].to_numpy(dtype=float) * properties['scaling']
+
+            for ind, y in enumerate(channel_data.T):
                 if ind == 0:
                     label = f"{file.filepath.name.upper()} (Maxwell)"
 
@@ -1009,9 +1031,6 @@ class TestRunner(QMainWindow, test_runnerUI):
                 else:
                     label = None
 
-                x = comp_data.STATION.astype(float) + properties['station_shift']
-                y = comp_data.loc[:, ch].astype(float) * properties['scaling']
-
                 # style = '--' if 'Q' in freq else '-'
                 self.ax.plot(x, y,
                              color=color,
@@ -1020,8 +1039,7 @@ class TestRunner(QMainWindow, test_runnerUI):
                              zorder=1)
 
         def plot_plate(filepath, component):
-            parser = PlateFFile()
-            file = parser.parse(filepath)
+            file = parse_file(PlateFFile, filepath)
 
             print(f"Plotting {filepath.name}.")
             properties = self.get_plotting_info('PLATE')  # Plotting properties
@@ -1044,7 +1062,10 @@ class TestRunner(QMainWindow, test_runnerUI):
                 print(f"No {component} data in {file.filepath.name}.")
                 return
 
-            for ind, ch in enumerate(plotting_channels):
+            x = comp_data.Station.to_numpy(dtype=float) + properties['station_shift']
+            channel_data = comp_data.loc[:, plotting_channels].to_numpy(dtype=float) * properties['scaling']
+
+            for ind, y in enumerate(channel_data.T):
                 if ind == 0:
                     label = f"{file.filepath.name.upper()} (PLATE)"
 
@@ -1057,9 +1078,6 @@ class TestRunner(QMainWindow, test_runnerUI):
                 else:
                     label = None
 
-                x = comp_data.Station.astype(float) + properties['station_shift']
-                y = comp_data.loc[:, ch].astype(float) * properties['scaling']
-
                 self.ax.plot(x, y,
                              color=color,
                              alpha=properties['alpha'],
@@ -1068,8 +1086,7 @@ class TestRunner(QMainWindow, test_runnerUI):
                              zorder=2)
 
         def plot_mun(filepath, component):
-            parser = MUNFile()
-            file = parser.parse(filepath)
+            file = parse_file(MUNFile, filepath)
 
             print(f"Plotting {filepath.name}.")
             properties = self.get_plotting_info('MUN')  # Plotting properties
@@ -1092,7 +1109,11 @@ class TestRunner(QMainWindow, test_runnerUI):
                 print(f"No {component} data in {file.filepath.name}.")
                 return
 
-            for ind, ch in enumerate(plotting_channels):
+            # Convert to arrays once, so the loop below hands plain ndarrays to matplotlib
+            x = comp_data.Station.to_numpy(dtype=float) + properties['station_shift']
+            channel_data = comp_data.loc[:, plotting_channels].to_numpy(dtype=float) * properties['scaling']
+
+            for ind, y in enumerate(channel_data.T):
                 # If coloring by channel, uses the rainbow color iterator and the label is the channel number.
                 if ind == 0:
                     label = f"{file.filepath.name.upper()} (MUN)"
@@ -1105,9 +1126,6 @@ class TestRunner(QMainWindow, test_runnerUI):
                 else:
                     label = None
 
-                x = comp_data.Station.astype(float) + properties['station_shift']
-                y = comp_data.loc[:, ch].astype(float) * properties['scaling']
-
                 self.ax.plot(x, y,
                              color=color,
                              alpha=properties['alpha'],
@@ -1120,8 +1138,7 @@ class TestRunner(QMainWindow, test_runnerUI):
             :param filepath: Path object
             :param component: Str, either X, Y, or Z.
             """
-            parser = IRAPFile()
-            file = parser.parse(filepath)
+            file = parse_file(IRAPFile, filepath)
 
             print(f"Plotting {filepath.name}.")
             properties = self.get_plotting_info('IRAP')  # Plotting properties
@@ -1134,17 +1151,24 @@ class TestRunner(QMainWindow, test_runnerUI):
             #         self.msg.warning(self, "Different Units", f"The units of {file.filepath.name} are different then"
             #                                                   f"the existing units ({file.units} vs {self.units})")
 
-            comp_data = file.data[file.data.Component == component]
-            if comp_data.empty:
+            # Split the data by component once per file, rather than comparing every row for each component
+            if filepath not in irap_components:
+                irap_components[filepath] = {comp: comp_data for comp, comp_data
+                                             in file.data.groupby('Component', observed=True)}
+            comp_data = irap_components[filepath].get(component)
+            if comp_data is None or comp_data.empty:
                 print(f"No {component} data in {file.filepath.name}.")
                 return
 
-            channels = file.ch_times.index
+            channels = [f'{num}' for num in range(1, len(file.ch_times) + 1)]
             min_ch = properties['ch_start'] - 1
             max_ch = min(properties['ch_end'] - 1, len(channels) - 1)
             plotting_channels = channels[min_ch: max_ch + 1]
 
-            for ind, ch in enumerate(plotting_channels):
+            x = comp_data.Station.to_numpy(dtype=float) + properties['station_shift']
+            channel_data = comp_data.loc[:, plotting_channels].to_numpy(dtype=float) * properties['scaling']
+
+            for ind, y in enumerate(channel_data.T):
                 if ind == 0:
                     label = f"{file.filepath.name.upper()} (IRAP)"
 
@@ -1157,9 +1181,6 @@ class TestRunner(QMainWindow, test_runnerUI):
                 else:
                     label = None
 
-                x = comp_data.Station.astype(float) + properties['station_shift']
-                y = comp_data.loc[:, ch].astype(float) * properties['scaling']
-
                 self.ax.plot(x, y,
                              color=color,
                              alpha=properties['alpha'],
@@ -1169,9 +1190,6 @@ class TestRunner(QMainWindow, test_runnerUI):
         def get_fixed_range():
             """Find the Y range of each file"""
             progress.setLabelText("Calculating Ranges")
-            max_parser = TEMFile()
-            plate_parser = PlateFFile()
-            mun_parser = MUNFile()
             count = 0
 
             mins, maxs = [], []
@@ -1179,7 +1197,7 @@ class TestRunner(QMainWindow, test_runnerUI):
                 if progress.wasCanceled():
                     break
 
-                max_file = max_parser.parse(max_filepath)
+                max_file = TEMFile().parse(max_filepath)
                 rng = max_file.get_range()
                 mins.append(rng[0] * self.get_plotting_info('Maxwell')["scaling"])
                 maxs.append(rng[1] * self.get_plotting_info('Maxwell')["scaling"])
@@ -1191,7 +1209,7 @@ class TestRunner(QMainWindow, test_runnerUI):
                 if progress.wasCanceled():
                     break
 
-                plate_file = plate_parser.parse(plate_filepath)
+                plate_file = PlateFFile().parse(plate_filepath)
                 rng = plate_file.get_range()
                 mins.append(rng[0] * self.get_plotting_info('PLATE')["scaling"])
                 maxs.append(rng[1] * self.get_plotting_info('PLATE')["scaling"])
@@ -1220,9 +1238,8 @@ class TestRunner(QMainWindow, test_runnerUI):
 
             if self.custom_stations_cbox.isChecked():
                 self.ax.set_xlim([self.station_start_sbox.value(), self.station_end_sbox.value()])
-            if self.fixed_range_cbox.isChecked():
-                y_range = np.array(get_fixed_range())
-                self.ax.set_ylim([y_range[0], y_range[1]])
+            if fixed_range is not None:
+                self.ax.set_ylim([fixed_range[0], fixed_range[1]])
 
             # Create the legend
             handles, labels = self.ax.get_legend_handles_labels()
@@ -1244,6 +1261,9 @@ class TestRunner(QMainWindow, test_runnerUI):
         progress.setWindowTitle("Printing Profiles")
         progress.show()
 
+        # The range is the same for every plot, so it is found once rather than for every component of every set
+        fixed_range = np.array(get_fixed_range()) if self.fixed_range_cbox.isChecked() else None
+
         count = 0
         progress.setValue(count)
         progress.setLabelText("Printing Profile Plots")
@@ -1254,6 +1274,9 @@ class TestRunner(QMainWindow, test_runnerUI):
                     print(f"Process cancelled.")
                     break
 
+                # The files of the previous set are not needed anymore
+                parsed_files.clear()
+                irap_components.clear()
                 print(f"Plotting set {count + 1}/{int(num_files_found)}")
                 for component in [cbox.text() for cbox in [self.x_cbox, self.y_cbox, self.z_cbox] if cbox.isChecked()]:
                     self.footnote = ''
@@ -1849,7 +1872,6 @@ class TestRunner(QMainWindow, test_runnerUI):
             # Find the first column where all columns past it have a difference less than 1.
             convergences = []
             for i, row in convergence_df.iterrows():
-                print(f"Items in row:\n{row}")
                 convergence = find_convergence(row, 0.1)
                 convergences.append(convergence)
 
@@ -56,12 +56,9 @@ def get_selected_time_channels(time, tch):
     This function tries to get the indices of the time array where the elements
     are the closest to tch
     """
-    time_diff = np.zeros(len(time))
-    selected_ch = []
-    for ich in range(len(tch)):
-        for iline in range(len(time)):
-            time_diff[iline] = abs(time[iline] - tch[ich])
-        selected_ch.append(np.argmin(time_diff))
+    # time differences of every channel (rows) to every time instant (columns)
+    time_diff = np.abs(np.asarray(time, dtype=float)[np.newaxis, :] - np.asarray(tch, dtype=float)[:, np.newaxis])
+    selected_ch = time_diff.argmin(axis=1)
 
     return selected_ch
 
@@ -248,9 +245,6 @@ def read_em3d_raw(filename, n_rec, n_step, ch, t_filename, interp=False,
 
     """
 
-    # Initialize proper arrays for the field values
-    field = np.zeros((n_step, n_rec, n_comp), dtype=float)
-
     # Read in the original responses
     data = np.loadtxt(filename, dtype=float)
     # print("amount of dBdt data values: ", np.size(data))
@@ -260,15 +254,9 @@ def read_em3d_raw(filename, n_rec, n_step, ch, t_filename, interp=False,
 
     # print(f"Check: {(len(data) / n_step)} == {n_rec} = {(len(data) / n_step) == n_rec}")
 
-    # Extract the information from data to field(n_step, n_rec, n_comp)
-    istart = 0
-    for istep in range(n_step):
-        # print(F"istep: {istep}")
-        istop = istart + n_rec
-        # print(F"istop: {istop}\n")
-        # print(f"Adding data: {data[istart:istop, :]}")
-        field[istep, :, :] = data[istart:istop, :]
-        istart = istop
+    # Extract the information from data to field(n_step, n_rec, n_comp). The rows are stored step by step, with
+    # n_rec rows per step, so the whole block is reshaped at once.
+    field = data[:n_step * n_rec, :].reshape(n_step, n_rec, n_comp)
 
     # Get the time instants for each step in the time-stepping process
     # idx_offtime is the index at which the response changes from on-time to
@@ -284,11 +272,12 @@ def read_em3d_raw(filename, n_rec, n_step, ch, t_filename, interp=False,
 
     # Get the responses at certain time gates
     field_out = np.zeros((nch, n_rec, n_comp), dtype=float)
+    time_min, time_max = np.nanmin(time_modeling), np.nanmax(time_modeling)
     for i in range(len(ch)):
-        if ch[i] < np.nanmin(time_modeling) or ch[i] > np.nanmax(time_modeling):
+        if ch[i] < time_min or ch[i] > time_max:
             print("time channel requested: ", ch[i] * 1.e+3, " ms")
-            print("Time range of the data: ", np.nanmin(time_modeling) * 1.e+3,
-                  np.nanmax(time_modeling) * 1.e+3, " ms")
+            print("Time range of the data: ", time_min * 1.e+3,
+                  time_max * 1.e+3, " ms")
             raise Exception("Selected time channel outside the time range in the data!")
    
     if interp:
@@ -298,6 +287,8 @@ def read_em3d_raw(filename, n_rec, n_step, ch, t_filename, interp=False,
                 field_out[:, irec, icomp] = tmp
     else:
         selected_time_index = get_selected_time_channels(time_modeling, ch)
+        # take the closest time step of every channel at once, then only redo the channels which are too far off
+        field_out[:, :, :] = field[selected_time_index, :, :]
         for i in range(len(selected_time_index)):
             k = selected_time_index[i]
             if( abs(time_modeling[k] - ch[i]) > 0.1 * abs(ch[i]) ):
@@ -312,9 +303,6 @@ def read_em3d_raw(filename, n_rec, n_step, ch, t_filename, interp=False,
                         tmp = spline_interpolate(time_modeling[k-2:k+2], field[k-2:k+2, irec, icomp],
                                                  ch[i], y=True)
                         field_out[i, irec, icomp] = tmp
-            else:
-                # put the following in iteration to allow ch.size be larger than time_modelling.size
-                field_out[i,:,:] = field[k, :, :]
 
     return field_out
 
@@ -37,8 +37,8 @@ def format_file_names():
     new_files = list(output_folder.glob("*.dat"))
     for file in new_files:
         if "3D_modelling_results_Crone_50ms_Model8_" in file.name:
-            print(f"Renaming {file.name} to {re.sub('3D_modelling_results_Crone_50ms_Model8_', '', file.name)}")
-            file.rename(output_folder.joinpath(re.sub("3D_modelling_results_Crone_50ms_Model8_", "", file.name)))
+            print(f"Renaming {file.name} to {file.name.replace('3D_modelling_results_Crone_50ms_Model8_', '')}")
+            file.rename(output_folder.joinpath(file.name.replace("3D_modelling_results_Crone_50ms_Model8_", "")))
     
     print("Removing '_dBdt'")
     new_files = list(output_folder.glob("*.dat"))
@@ -46,7 +46,7 @@ def format_file_names():
     for file in new_files:
         if "_dBdt" in file.name:
             print(f"Removing 'dBdt' from {file.name}")
-            file.rename(output_folder.joinpath(re.sub("_dBdt", "", file.name)))
+            file.rename(output_folder.joinpath(file.name.replace("_dBdt", "")))
 
 
 def rename_files():